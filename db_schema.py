@@ -0,0 +1,80 @@
+# db_schema.py
+import sqlite3
+
+DB_PATH = "user_data.db"
+
+# Columns added after the first release, as (name, type)
+UPLOAD_COLUMNS = (
+    ("fingerprint", "TEXT"),
+    ("analysis", "TEXT"),
+    ("version", "INTEGER"),
+)
+
+
+# ==========================
+# SCHEMA + MIGRATIONS
+# ==========================
+def init_db(conn):
+    """
+    Create or migrate the tables shared by both dashboards.
+    Safe to call from every app at startup, in any order.
+    """
+    cursor = conn.cursor()
+
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS users (
+        user_id INTEGER PRIMARY KEY,
+        username TEXT UNIQUE,
+        password TEXT
+    )
+    ''')
+
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS uploads (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        video_path TEXT,
+        text_report TEXT,
+        status TEXT DEFAULT 'Pending',
+        fingerprint TEXT,
+        analysis TEXT,
+        version INTEGER,
+        FOREIGN KEY(user_id) REFERENCES users(user_id)
+    )
+    ''')
+
+    # Add columns missing from databases created by older versions
+    existing_columns = {row[1] for row in cursor.execute('PRAGMA table_info(uploads)')}
+    for column, column_type in UPLOAD_COLUMNS:
+        if column not in existing_columns:
+            try:
+                cursor.execute(f'ALTER TABLE uploads ADD COLUMN {column} {column_type}')
+            except sqlite3.OperationalError as e:
+                # The other dashboard migrated the same database first
+                if "duplicate column" not in str(e):
+                    raise
+    cursor.execute('UPDATE uploads SET version = id WHERE version IS NULL')
+
+    # Change feed: every insert and status/analysis update bumps the row to a
+    # new table-wide version, so dashboards can fetch only rows changed since
+    # the last version they saw.
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_uploads_version ON uploads(version)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_uploads_user_version ON uploads(user_id, version)')
+
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS uploads_version_insert AFTER INSERT ON uploads
+    BEGIN
+        UPDATE uploads SET version = (SELECT COALESCE(MAX(version), 0) + 1 FROM uploads)
+        WHERE id = NEW.id;
+    END
+    ''')
+
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS uploads_version_update AFTER UPDATE OF status, analysis ON uploads
+    BEGIN
+        UPDATE uploads SET version = (SELECT COALESCE(MAX(version), 0) + 1 FROM uploads)
+        WHERE id = NEW.id;
+    END
+    ''')
+
+    conn.commit()
@@ -1,81 +1,339 @@
+import os
+import json
+import multiprocessing
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import repeat
+
 import cv2
 import numpy as np
 import librosa
 from scipy.signal import welch
-from moviepy.editor import VideoFileClip
+from moviepy.editor import AudioFileClip, VideoFileClip
+
+# Every SAMPLE_STRIDE-th frame goes through face / FFT analysis
+SAMPLE_STRIDE = 10
+# Length of one analysis segment (and one timeline entry) in seconds
+SEGMENT_SECONDS = 10.0
+# Worker processes per analyzed video; the pool is shared by every analysis in the process
+SEGMENT_WORKERS = min(4, os.cpu_count() or 1)
+# Decoded frames buffered ahead of analysis (caps memory per segment)
+PREFETCH_SLOTS = 8
+# Threads for the GIL-releasing OpenCV / NumPy FFT analysis
+ANALYSIS_THREADS = 2
+
+
+class FramePrefetcher:
+    """
+    Decode thread filling a ring buffer of preallocated frame arrays.
+    Consumers get views into the ring and must release() each slot once all
+    readers of that frame are done; the decoder blocks when no slot is free,
+    so at most `slots` frames are held in memory.
+
+    Sequential frames are read from the ffmpeg pipe straight into their slot.
+    The decoder keeps its own reference on the newest slot, to repeat it if
+    the stream ends early, so `slots` must be at least 2.
+    """
+
+    def __init__(self, video, times, indices, slots=PREFETCH_SLOTS):
+        self.video = video
+        self.reader = video.reader
+        self.times = times
+        self.indices = indices
+        self.slots = slots
+        width, height = self.reader.size
+        self.ring = np.empty((slots, height, width, self.reader.depth), dtype=np.uint8)
+        self.refs = [0] * slots
+        self.lock = threading.Lock()
+        self.free = queue.Queue()
+        self.ready = queue.Queue()
+        self.stopped = False
+
+        for slot in range(slots):
+            self.free.put(slot)
+
+        self.thread = threading.Thread(target=self._decode, daemon=True)
+        self.thread.start()
+
+    def _decode(self):
+        last = None
+        try:
+            for i in self.indices:
+                slot = self.free.get()
+                if self.stopped:
+                    break
+
+                self._read_into(self.times[i], slot, last)
+
+                # One reference for the consumer, one held until the next frame is in
+                self.refs[slot] = 2
+                self.ready.put((i, slot))
+                if last is not None:
+                    self.release(last)
+                last = slot
+        except Exception as e:
+            self.ready.put(e)
+        if last is not None:
+            self.release(last)
+        self.ready.put(None)
+
+    def _read_into(self, t, slot, last):
+        """Decode the frame at time t into ring[slot]"""
+        reader = self.reader
+        target = self.ring[slot]
+        # Same frame numbering as FFMPEG_VideoReader.get_frame
+        pos = int(reader.fps * t + 0.00001) + 1
+
+        if reader.proc is None or pos != reader.pos + 1:
+            # First frame or a seek: let moviepy reposition the pipe
+            if last is not None:
+                reader.lastread = self.ring[last].copy()
+            np.copyto(target, reader.get_frame(t))
+            return
+
+        n_bytes = reader.proc.stdout.readinto(memoryview(target).cast('B'))
+        reader.pos = pos
+        if n_bytes != target.nbytes:
+            # Stream ended before the reported duration: repeat the last frame, as moviepy does
+            np.copyto(target, self.ring[last] if last is not None else reader.lastread)
+
+    def __iter__(self):
+        """Yields (frame index, slot, frame view) in decode order"""
+        while True:
+            item = self.ready.get()
+            if item is None:
+                return
+            if isinstance(item, Exception):
+                raise item
+            i, slot = item
+            yield i, slot, self.ring[slot]
+
+    def retain(self, slot):
+        with self.lock:
+            self.refs[slot] += 1
+
+    def release(self, slot):
+        with self.lock:
+            self.refs[slot] -= 1
+            if self.refs[slot] == 0:
+                self.free.put(slot)
+
+    def close(self):
+        self.stopped = True
+        self.free.put(None)
+        self.thread.join()
+
 
 class SimpleDeepfakeDetector:
-    def __init__(self):
-        # Initialize Haar face detector
-        self.face_cascade = cv2.CascadeClassifier(
-            cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
-        )
+    weights = {'facial': 0.4, 'frequency': 0.3, 'audio_visual': 0.3}
+
+    def process_video(self, video_path, workers=None, segment_seconds=SEGMENT_SECONDS):
+        """
+        Split the video into segments of `segment_seconds`, analyze them in
+        up to `workers` processes (default: SEGMENT_WORKERS) and merge the partial
+        statistics into the global scores plus a per-segment timeline.
+        """
+        # Only metadata here; frames and audio are decoded by the segment workers
+        video = VideoFileClip(video_path, audio=False)
+        try:
+            n_frames = len(np.arange(0, video.duration, 1.0 / video.fps))
+            step = max(int(round(segment_seconds * video.fps)), 1)
+            bounds = [(start, min(start + step, n_frames)) for start in range(0, n_frames, step)]
+            fps = video.fps
+        finally:
+            video.close()
+
+        workers = workers or SEGMENT_WORKERS
+        starts = [start for start, _ in bounds]
+        stops = [stop for _, stop in bounds]
+
+        if workers > 1 and len(bounds) > 1:
+            try:
+                parts = list(_get_segment_pool(workers).map(_analyze_segment, repeat(video_path), starts, stops))
+            except BrokenProcessPool:
+                _discard_segment_pool(workers)
+                raise
+        else:
+            parts = [
+                self._analyze_segment(video_path, start, stop)
+                for start, stop in bounds
+            ]
+
+        return self._merge_segments(parts, fps)
+
+    def _analyze_segment(self, video_path, start, stop):
+        """
+        Partial statistics for frames [start, stop) of the video.
+        Only this range (plus one lead-in frame for the frame diff across the
+        segment boundary) is decoded. Decoding runs on a prefetch thread and
+        sampled frames are analyzed on a small thread pool while the next
+        frames are being decoded.
+        """
+        sample_futures = []
+        frame_diffs = []
+
+        video = VideoFileClip(video_path, audio=False)
+        fps = video.fps
+        times = np.arange(0, video.duration, 1.0 / fps)
+        prefetcher = FramePrefetcher(video, times, range(max(start - 1, 0), stop))
+        pool = _get_analysis_pool()
+        try:
+            prev = None
+            prev_slot = None
+
+            for i, slot, frame in prefetcher:
+                if i >= start and i % SAMPLE_STRIDE == 0:
+                    prefetcher.retain(slot)
+                    future = pool.submit(self._analyze_sample, frame)
+                    future.add_done_callback(lambda _, s=slot: prefetcher.release(s))
+                    sample_futures.append(future)
+
+                if prev is not None:
+                    frame_diffs.append(np.mean(np.abs(frame - prev)))
+                    prefetcher.release(prev_slot)
+                prev, prev_slot = frame, slot
+
+            # Keep results in frame order so the merged means match a serial pass
+            samples = [future.result() for future in sample_futures]
+        finally:
+            # Wait out pending samples: they read frames from the ring
+            for future in sample_futures:
+                future.exception()
+            prefetcher.close()
+            video.close()
+
+        facial_scores = [face for face, _ in samples if face is not None]
+        freq_scores = [freq for _, freq in samples]
+
+        # Diff j ends on frame j + 1, so this segment's diffs end on frames
+        # [stop - len(frame_diffs), stop); pair them with the audio of those frames
+        frame_energy = self._frame_energy(video_path, fps, stop - len(frame_diffs), stop)
+
+        return {
+            'start': start,
+            'stop': stop,
+            'facial': np.asarray(facial_scores, dtype=np.float64),
+            'frequency': np.asarray(freq_scores, dtype=np.float64),
+            'frame_diffs': np.asarray(frame_diffs, dtype=np.float64),
+            'frame_energy': frame_energy,
+        }
+
+    def _merge_segments(self, parts, fps):
+        """Combine per-segment statistics into global scores and a timeline"""
+        facial = np.concatenate([p['facial'] for p in parts]) if parts else np.empty(0)
+        freq = np.concatenate([p['frequency'] for p in parts]) if parts else np.empty(0)
+        frame_diffs = np.concatenate([p['frame_diffs'] for p in parts]) if parts else np.empty(0)
+        has_audio = bool(parts) and all(p['frame_energy'] is not None for p in parts)
+        frame_energy = np.concatenate([p['frame_energy'] for p in parts]) if has_audio else None
 
-    def process_video(self, video_path):
         scores = {
-            'facial': 0,
-            'frequency': 0,
-            'audio_visual': 0
+            'facial': np.mean(facial) if facial.size else 0.5,
+            'frequency': np.mean(freq) if freq.size else 0.5,
+            'audio_visual': self._audio_visual_score(frame_diffs, frame_energy)
         }
 
-        # Load video
-        video = VideoFileClip(video_path)
-        frames = [frame for frame in video.iter_frames()]
-        audio = video.audio
+        results = self._calculate_final_score(scores)
+        results['timeline'] = self._build_timeline(parts, fps)
+        return results
+
+    def _build_timeline(self, parts, fps):
+        """Per-segment scores as compact float32 arrays, keyed by component"""
+        timeline = {key: [] for key in ('start', 'end', 'facial', 'frequency', 'audio_visual', 'final')}
 
-        # Compute scores
-        scores['facial'] = self._analyze_face_movement(frames)
-        scores['frequency'] = self._analyze_frequency_domain(frames)
-        scores['audio_visual'] = self._analyze_audio_visual_sync(frames, audio)
+        for p in parts:
+            segment_scores = {
+                'facial': np.mean(p['facial']) if p['facial'].size else 0.5,
+                'frequency': np.mean(p['frequency']) if p['frequency'].size else 0.5,
+                'audio_visual': self._audio_visual_score(p['frame_diffs'], p['frame_energy'])
+            }
 
-        return self._calculate_final_score(scores)
+            timeline['start'].append(p['start'] / fps)
+            timeline['end'].append(p['stop'] / fps)
+            for c in segment_scores:
+                timeline[c].append(segment_scores[c])
+            timeline['final'].append(
+                sum(segment_scores[c] * self.weights[c] for c in segment_scores)
+            )
 
-    def _analyze_face_movement(self, frames):
-        """Face movement consistency using Haar Cascades"""
-        facial_scores = []
+        return {key: np.asarray(values, dtype=np.float32) for key, values in timeline.items()}
 
-        for frame in frames[::10]:
-            gray = cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY)
-            faces = self.face_cascade.detectMultiScale(gray, 1.3, 5)
+    def _frame_energy(self, video_path, fps, first, stop):
+        """
+        Mean audio energy over each frame's time span, for frames [first, stop).
+        Only that time range is decoded, in chunks. None if there is no audio.
+        """
+        n_frames = stop - first
+        if n_frames <= 0:
+            return np.empty(0)
 
-            if len(faces) > 0:
-                areas = [w * h for (_, _, w, h) in faces]
+        try:
+            audio = AudioFileClip(video_path)
+        except Exception:
+            return None
 
-                if np.mean(areas) != 0:
-                    score = 1 - (np.std(areas) / np.mean(areas))
-                    facial_scores.append(score)
+        try:
+            sums = np.zeros(n_frames)
+            counts = np.zeros(n_frames)
+            start_t, end_t = first / fps, min(stop / fps, audio.duration)
 
-        return np.mean(facial_scores) if facial_scores else 0.5
+            if end_t > start_t:
+                offset = 0
+                for chunk in audio.subclip(start_t, end_t).iter_chunks(chunksize=50000, fps=audio.fps):
+                    energy = np.abs(chunk.mean(axis=1))
+                    frames = ((offset + np.arange(len(energy))) * fps / audio.fps).astype(int)
+                    frames = np.minimum(frames, n_frames - 1)
+                    sums += np.bincount(frames, weights=energy, minlength=n_frames)
+                    counts += np.bincount(frames, minlength=n_frames)
+                    offset += len(energy)
 
-    def _analyze_frequency_domain(self, frames):
-        """Frequency analysis using FFT"""
-        freq_scores = []
+            return np.where(counts > 0, sums / np.maximum(counts, 1), 0.0)
+        except Exception:
+            return None
+        finally:
+            audio.close()
 
-        for frame in frames[::10]:
-            gray = cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY)
-            f_transform = np.fft.fft2(gray)
-            f_shift = np.fft.fftshift(f_transform)
+    def _analyze_sample(self, frame):
+        """(face score or None, frequency score) for one sampled RGB frame"""
+        gray = cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY)
+        return self._face_score(gray), self._frequency_score(gray)
 
-            spectrum = np.log(np.abs(f_shift) + 1)
-            score = 1 - (np.std(spectrum) / np.mean(spectrum))
-            freq_scores.append(score)
+    def _cascade(self):
+        """Haar face detector owned by the calling thread (CascadeClassifier is not thread-safe)"""
+        cascade = getattr(_thread_state, 'cascade', None)
+        if cascade is None:
+            cascade = _thread_state.cascade = cv2.CascadeClassifier(
+                cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
+            )
+        return cascade
 
-        return np.mean(freq_scores) if freq_scores else 0.5
+    def _face_score(self, gray):
+        """Face-area consistency for one grayscale frame, None if no face"""
+        faces = self._cascade().detectMultiScale(gray, 1.3, 5)
 
-    def _analyze_audio_visual_sync(self, frames, audio):
-        """Simplified audio-visual sync estimation"""
-        if audio is None:
-            return 0.5
+        if len(faces) > 0:
+            areas = [w * h for (_, _, w, h) in faces]
 
-        try:
-            audio_data = audio.to_soundarray()
-            audio_energy = np.abs(audio_data.mean(axis=1))
+            if np.mean(areas) != 0:
+                return 1 - (np.std(areas) / np.mean(areas))
 
-            frame_diffs = [
-                np.mean(np.abs(frames[i + 1] - frames[i]))
-                for i in range(len(frames) - 1)
-            ]
+        return None
 
+    def _frequency_score(self, gray):
+        """FFT spectrum flatness for one grayscale frame"""
+        f_transform = np.fft.fft2(gray)
+        f_shift = np.fft.fftshift(f_transform)
+
+        spectrum = np.log(np.abs(f_shift) + 1)
+        return 1 - (np.std(spectrum) / np.mean(spectrum))
+
+    def _audio_visual_score(self, frame_diffs, audio_energy):
+        """Correlation between per-frame audio energy and frame differences"""
+        if audio_energy is None:
+            return 0.5
+
+        try:
             # Normalize safely
             audio_energy = (audio_energy - audio_energy.min()) / (audio_energy.max() - audio_energy.min() + 1e-6)
             frame_diffs = (frame_diffs - np.min(frame_diffs)) / (np.max(frame_diffs) - np.min(frame_diffs) + 1e-6)
@@ -86,17 +344,16 @@ class SimpleDeepfakeDetector:
                 frame_diffs
             )[0, 1]
 
-            return float(abs(correlation))
+            # Constant diffs or silence give NaN, which JSON can't carry
+            return float(abs(correlation)) if np.isfinite(correlation) else 0.5
 
         except Exception:
             return 0.5
 
     def _calculate_final_score(self, scores):
         """Weighted combination of components"""
-        weights = {'facial': 0.4, 'frequency': 0.3, 'audio_visual': 0.3}
-
         final_score = sum(
-            scores[c] * weights[c] for c in scores
+            scores[c] * self.weights[c] for c in scores
         )
 
         return {
@@ -110,8 +367,81 @@ class SimpleDeepfakeDetector:
         }
 
 
+# Per-process detector used by the segment workers
+_worker_detector = None
+
+# Per-process analysis threads; each keeps its Haar cascade for the life of
+# the process instead of reloading it for every segment
+_analysis_pool = None
+_analysis_pool_lock = threading.Lock()
+_thread_state = threading.local()
+
+
+def _get_analysis_pool():
+    global _analysis_pool
+    with _analysis_pool_lock:
+        if _analysis_pool is None:
+            _analysis_pool = ThreadPoolExecutor(max_workers=ANALYSIS_THREADS)
+        return _analysis_pool
+
+
+# One spawn pool per worker count, reused across analyses so workers start once
+_segment_pools = {}
+_segment_pools_lock = threading.Lock()
+
+
+def _get_segment_pool(workers):
+    """Shared process pool for segment analysis, created on first use"""
+    with _segment_pools_lock:
+        pool = _segment_pools.get(workers)
+        if pool is None:
+            # spawn: forking the multi-threaded Streamlit server can deadlock the child
+            context = multiprocessing.get_context("spawn")
+            pool = _segment_pools[workers] = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+        return pool
+
+
+def _discard_segment_pool(workers):
+    """Drop a broken pool so the next analysis starts a fresh one"""
+    with _segment_pools_lock:
+        pool = _segment_pools.pop(workers, None)
+    if pool is not None:
+        pool.shutdown(wait=False)
+
+
+def _analyze_segment(video_path, start, stop):
+    global _worker_detector
+    if _worker_detector is None:
+        _worker_detector = SimpleDeepfakeDetector()
+    return _worker_detector._analyze_segment(video_path, start, stop)
+
+
+def _to_builtin(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def results_to_json(results):
+    """Serialize process_video results for storage in the uploads table"""
+    return json.dumps(results, default=_to_builtin)
+
+
+def results_from_json(text):
+    """Inverse of results_to_json; timeline entries come back as float32 arrays"""
+    results = json.loads(text)
+    if 'timeline' in results:
+        results['timeline'] = {
+            key: np.asarray(values, dtype=np.float32)
+            for key, values in results['timeline'].items()
+        }
+    return results
+
+
 # Standalone usage
-def analyze_video(video_path):
+def analyze_video(video_path, workers=None):
     detector = SimpleDeepfakeDetector()
-    results = detector.process_video(video_path)
+    results = detector.process_video(video_path, workers=workers)
     return results
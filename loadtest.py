@@ -0,0 +1,419 @@
+# loadtest.py
+"""
+Headless load test for the two Streamlit dashboards.
+
+Drives user_input.py (reporters) and submission_verification.py (reviewers)
+through Streamlit's AppTest with N simulated users running at the same time
+against one SQLite file. Each user gets its own process: AppTest keeps
+process-global runtime state, so concurrent AppTests in one process break.
+Lingo.dev, Gemini and the deepfake pipeline
+are swapped for local fakes with configurable latency, and every SQLite
+statement is timed. Lock waits are handled by the harness instead of
+SQLite's busy handler, so time spent waiting on other writers is reported
+separately from the statements' own latency.
+
+Limitation: N processes are N separate app instances that only share the
+SQLite file. A real `streamlit run` server serves all sessions from one
+process, so they also contend for its GIL and script-runner threads and
+share one @st.cache_resource connection (and fingerprint index). None of
+that is measured here, and the latencies overstate what a single server
+instance sustains with N users.
+
+Usage:
+    python loadtest.py --reporters 20 --reviewers 5 --reruns 10
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from streamlit.testing.v1 import AppTest
+
+import dfpipeline
+import gemini_processing
+import lingo_translation
+
+APP_DIR = Path(__file__).resolve().parent
+USER_APP = str(APP_DIR / "user_input.py")
+AUTHORITY_APP = str(APP_DIR / "submission_verification.py")
+
+DEMO_USERS = [(f"reporter{i}", f"password{i}") for i in range(1, 5)]
+
+
+# ==========================
+# METRICS
+# ==========================
+class Metrics:
+    """Thread-safe collector for rerun latencies, errors and DB timings"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.reruns = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.db_reads = []
+        self.db_writes = []
+        self.db_waits = []
+        self.db_locked = 0
+        self.aborted = defaultdict(int)
+
+    def snapshot(self):
+        """Plain-data copy for sending back from a worker process"""
+        with self.lock:
+            return {
+                'reruns': dict(self.reruns),
+                'errors': dict(self.errors),
+                'aborted': dict(self.aborted),
+                'db_reads': list(self.db_reads),
+                'db_writes': list(self.db_writes),
+                'db_waits': list(self.db_waits),
+                'db_locked': self.db_locked,
+            }
+
+    def merge(self, snapshot):
+        with self.lock:
+            for app, values in snapshot['reruns'].items():
+                self.reruns[app].extend(values)
+            for field in ('errors', 'aborted'):
+                for app, count in snapshot[field].items():
+                    getattr(self, field)[app] += count
+            self.db_reads.extend(snapshot['db_reads'])
+            self.db_writes.extend(snapshot['db_writes'])
+            self.db_waits.extend(snapshot['db_waits'])
+            self.db_locked += snapshot['db_locked']
+
+    def record_rerun(self, app, elapsed, failed):
+        with self.lock:
+            self.reruns[app].append(elapsed)
+            if failed:
+                self.errors[app] += 1
+
+    def record_statement(self, is_write, elapsed, waited, locked):
+        with self.lock:
+            (self.db_writes if is_write else self.db_reads).append(elapsed)
+            if waited > 0:
+                self.db_waits.append(waited)
+            if locked:
+                self.db_locked += 1
+
+
+METRICS = Metrics()
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+# ==========================
+# LOCAL FAKES
+# ==========================
+class FakeLingoEngine:
+    """Stands in for LingoDotDevEngine; echoes text back after `latency` seconds"""
+    latency = 0.0
+
+    @classmethod
+    async def quick_translate(cls, text, api_key=None, source_locale=None, target_locale=None):
+        await asyncio.sleep(cls.latency)
+        return text
+
+
+class FakeGemini:
+    """Stands in for ChatGoogleGenerativeAI; returns a fixed structured answer"""
+    latency = 0.0
+
+    class Response:
+        def __init__(self, content):
+            self.content = content
+
+    def __init__(self, **kwargs):
+        pass
+
+    def invoke(self, prompt):
+        time.sleep(self.latency)
+        return self.Response(
+            "Time of Crime: Not Found\nPlace of Crime: Not Found\nCrime Details: Load test report"
+        )
+
+
+def make_fake_analyze_video(latency):
+    def fake_analyze_video(video_path, workers=None):
+        time.sleep(latency)
+        return {
+            'final_score': 0.8,
+            'component_scores': {'facial': 0.8, 'frequency': 0.8, 'audio_visual': 0.8},
+            'interpretation': {'verdict': 'Real', 'confidence': 0.6, 'anomalies': []}
+        }
+    return fake_analyze_video
+
+
+WRITE_PREFIXES = ("INSERT", "UPDATE", "DELETE", "CREATE", "ALTER")
+# Sleep between retries of a statement blocked by another connection's lock
+BUSY_RETRY_SECONDS = 0.005
+
+
+def _is_write(sql):
+    return sql.lstrip().upper().startswith(WRITE_PREFIXES)
+
+
+def _timed(connection, is_write, call):
+    """
+    Run `call`, retrying on 'database is locked' until the connection's
+    original busy timeout runs out. Records the successful attempt's
+    latency and the busy-wait time before it separately.
+    """
+    started = time.perf_counter()
+    deadline = started + connection.busy_timeout
+    waited = 0.0
+
+    while True:
+        attempt = time.perf_counter()
+        try:
+            result = call()
+        except sqlite3.OperationalError as e:
+            locked = "locked" in str(e)
+            if not locked or time.perf_counter() >= deadline:
+                METRICS.record_statement(is_write, time.perf_counter() - attempt, waited, locked)
+                raise
+            time.sleep(BUSY_RETRY_SECONDS)
+            waited = time.perf_counter() - started
+            continue
+
+        METRICS.record_statement(is_write, time.perf_counter() - attempt, waited, False)
+        return result
+
+
+class TimedCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        return _timed(self.connection, _is_write(sql), lambda: super(TimedCursor, self).execute(sql, parameters))
+
+    def executemany(self, sql, seq_of_parameters):
+        # Materialize so a retry after a lock wait sees the same parameters
+        seq_of_parameters = list(seq_of_parameters)
+        return _timed(
+            self.connection, _is_write(sql),
+            lambda: super(TimedCursor, self).executemany(sql, seq_of_parameters)
+        )
+
+
+class TimedConnection(sqlite3.Connection):
+    def __init__(self, database, timeout=5.0, *args, **kwargs):
+        # SQLite would otherwise wait inside the statement; _timed waits instead
+        self.busy_timeout = timeout
+        super().__init__(database, 0, *args, **kwargs)
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    # Connection.execute/executemany create their cursor in C, bypassing cursor()
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def commit(self):
+        return _timed(self, True, super().commit)
+
+
+def install_fakes(translate_latency, gemini_latency, analysis_latency):
+    FakeLingoEngine.latency = translate_latency
+    FakeGemini.latency = gemini_latency
+
+    lingo_translation.LingoDotDevEngine = FakeLingoEngine
+    gemini_processing.ChatGoogleGenerativeAI = FakeGemini
+    dfpipeline.analyze_video = make_fake_analyze_video(analysis_latency)
+
+    real_connect = sqlite3.connect
+
+    def timed_connect(*args, **kwargs):
+        kwargs.setdefault("factory", TimedConnection)
+        return real_connect(*args, **kwargs)
+
+    sqlite3.connect = timed_connect
+
+
+# ==========================
+# SIMULATED USERS
+# ==========================
+def run_app(at, app):
+    start = time.perf_counter()
+    failed = False
+    try:
+        at.run()
+        failed = len(at.exception) > 0
+    except Exception:
+        failed = True
+    METRICS.record_rerun(app, time.perf_counter() - start, failed)
+    return not failed
+
+
+def reporter(user_index, reruns, timeout):
+    username, password = DEMO_USERS[user_index % len(DEMO_USERS)]
+    at = AppTest.from_file(USER_APP, default_timeout=timeout)
+    if not run_app(at, "reporter"):
+        return
+
+    at.text_input[0].input(username)
+    at.text_input[1].input(password)
+    at.button[0].click()
+    if not run_app(at, "reporter"):
+        return
+
+    for i in range(reruns):
+        # Sidebar: [language, dashboard option]
+        options = at.sidebar.selectbox[1].options
+        at.sidebar.selectbox[1].select(options[i % len(options)])
+        run_app(at, "reporter")
+
+
+def reviewer(user_index, reruns, timeout, report_ids):
+    rng = random.Random(user_index)
+    at = AppTest.from_file(AUTHORITY_APP, default_timeout=timeout)
+    if not run_app(at, "reviewer"):
+        return
+
+    for _ in range(reruns):
+        report_id = rng.choice(report_ids)
+        action = rng.choice(["analyze_video_btn", "analyze_text_btn", "accept_btn", "reject_btn"])
+        try:
+            at.button(key=f"{action}_{report_id}").click()
+        except KeyError:
+            pass
+        run_app(at, "reviewer")
+
+
+def init_worker(workdir, translate_latency, gemini_latency, analysis_latency):
+    install_fakes(translate_latency, gemini_latency, analysis_latency)
+    os.chdir(workdir)
+
+
+def run_session(role, user_index, reruns, timeout, report_ids):
+    """One simulated user in a worker process; returns its metrics"""
+    METRICS.reset()
+    try:
+        if role == "reporter":
+            reporter(user_index, reruns, timeout)
+        else:
+            reviewer(user_index, reruns, timeout, report_ids)
+    except Exception:
+        # e.g. an expected widget is missing after a failed rerun
+        METRICS.aborted[role] += 1
+    return METRICS.snapshot()
+
+
+def seed_reports(count):
+    """Create the schema via one user_input run, then insert `count` pending reports"""
+    AppTest.from_file(USER_APP, default_timeout=60).run()
+
+    conn = sqlite3.connect("user_data.db")
+    conn.executemany(
+        "INSERT INTO uploads (user_id, video_path, text_report) VALUES (?, ?, ?)",
+        [((i % len(DEMO_USERS)) + 1, f"uploads/missing_{i}.mp4", f"Load test report {i}") for i in range(count)]
+    )
+    conn.commit()
+    report_ids = [row[0] for row in conn.execute("SELECT id FROM uploads")]
+    conn.close()
+    return report_ids
+
+
+# ==========================
+# REPORT
+# ==========================
+def print_report(wall_time):
+    print(f"\nWall time: {wall_time:.2f}s")
+    print(
+        "Note: one process per user, i.e. separate app instances sharing only the SQLite file.\n"
+        "GIL, script-runner threads and @st.cache_resource state of a single `streamlit run`\n"
+        "server are not shared, so these latencies overstate single-instance capacity.\n"
+    )
+    print(
+        f"{'app':<10}{'reruns':>8}{'errors':>8}{'err %':>8}{'aborted':>9}"
+        f"{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+    )
+    for app in ("reporter", "reviewer"):
+        latencies = METRICS.reruns.get(app, [])
+        errors = METRICS.errors.get(app, 0)
+        rate = 100 * errors / len(latencies) if latencies else 0.0
+        print(
+            f"{app:<10}{len(latencies):>8}{errors:>8}{rate:>8.1f}{METRICS.aborted.get(app, 0):>9}"
+            + "".join(f"{percentile(latencies, p) * 1000:>10.1f}" for p in (50, 90, 99, 100))
+        )
+
+    print("\nSQLite")
+    for label, timings in (("reads", METRICS.db_reads), ("writes", METRICS.db_writes)):
+        print(
+            f"  {label:<7}{len(timings):>8} stmts"
+            f"  p50 {percentile(timings, 50) * 1000:.2f} ms"
+            f"  p99 {percentile(timings, 99) * 1000:.2f} ms"
+            f"  max {percentile(timings, 100) * 1000:.2f} ms"
+        )
+    waits = METRICS.db_waits
+    print(
+        f"  busy waits {len(waits):>5} stmts"
+        f"  total {sum(waits):.2f} s"
+        f"  p50 {percentile(waits, 50) * 1000:.2f} ms"
+        f"  p99 {percentile(waits, 99) * 1000:.2f} ms"
+        f"  max {percentile(waits, 100) * 1000:.2f} ms"
+    )
+    print(f"  'database is locked' errors (busy timeout exceeded): {METRICS.db_locked}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the WhistleSafe dashboards")
+    parser.add_argument("--reporters", type=int, default=10, help="simulated reporter sessions")
+    parser.add_argument("--reviewers", type=int, default=3, help="simulated authority sessions")
+    parser.add_argument("--reruns", type=int, default=5, help="interactions per session")
+    parser.add_argument("--reports", type=int, default=20, help="reports seeded before the run")
+    parser.add_argument("--translate-latency", type=float, default=0.05, help="seconds per fake translation")
+    parser.add_argument("--gemini-latency", type=float, default=0.5, help="seconds per fake Gemini call")
+    parser.add_argument("--analysis-latency", type=float, default=1.0, help="seconds per fake video analysis")
+    parser.add_argument("--timeout", type=float, default=120, help="AppTest timeout per rerun")
+    args = parser.parse_args()
+
+    # Both apps use relative paths (user_data.db, uploads/, reports/)
+    workdir = tempfile.mkdtemp(prefix="whistlesafe_load_")
+    print(f"Working directory: {workdir}")
+
+    def make_pool(workers):
+        return ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_worker,
+            initargs=(workdir, args.translate_latency, args.gemini_latency, args.analysis_latency),
+        )
+
+    # The apps only ever run in workers: AppTest replaces __main__, which
+    # would break pickling the tasks submitted from this process
+    with make_pool(1) as pool:
+        report_ids = pool.submit(seed_reports, args.reports).result()
+
+    sessions = [("reporter", i) for i in range(args.reporters)] + [("reviewer", i) for i in range(args.reviewers)]
+
+    with make_pool(len(sessions)) as pool:
+        start = time.perf_counter()
+        futures = [
+            pool.submit(run_session, role, i, args.reruns, args.timeout, report_ids)
+            for role, i in sessions
+        ]
+        for future in futures:
+            METRICS.merge(future.result())
+
+    print_report(time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,9 +7,11 @@ import streamlit as st
 import sqlite3
 from docx import Document
 
-from dfpipeline import analyze_video
+from db_schema import DB_PATH, init_db
+from dfpipeline import analyze_video, results_to_json, results_from_json
 from gemini_processing import process_question_with_doc, setup_gemini
 from lingo_translation import translate, LANGUAGES
+from video_fingerprint import MultiIndexHash, from_hex
 
 # -------------------------
 # Sidebar: Language selector
@@ -61,7 +63,8 @@ st.markdown(
 # -------------------------
 @st.cache_resource
 def get_database_connection():
-    conn = sqlite3.connect("user_data.db", check_same_thread=False)
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+    init_db(conn)
     return conn
 
 
@@ -69,11 +72,72 @@ conn = get_database_connection()
 cursor = conn.cursor()
 
 
-def get_all_reports():
-    cursor.execute("SELECT id, user_id, video_path, text_report, status FROM uploads")
+def get_report_changes(since_version):
+    cursor.execute(
+        "SELECT id, user_id, video_path, text_report, status, fingerprint, analysis, version "
+        "FROM uploads WHERE version > ? ORDER BY version",
+        (since_version,),
+    )
     return cursor.fetchall()
 
 
+def get_all_reports():
+    """Session-cached reports; each rerun only fetches rows changed since the last one"""
+    if "reports_cache" not in st.session_state:
+        st.session_state.reports_cache = {}
+        st.session_state.reports_version = 0
+
+    for row in get_report_changes(st.session_state.reports_version):
+        st.session_state.reports_cache[row[0]] = row[:-1]
+        st.session_state.reports_version = row[-1]
+
+    cache = st.session_state.reports_cache
+    return [cache[report_id] for report_id in sorted(cache)]
+
+
+def save_analysis(report_id, results):
+    cursor.execute("UPDATE uploads SET analysis = ? WHERE id = ?", (results_to_json(results), report_id))
+    conn.commit()
+
+
+def load_analysis(report_id):
+    cursor.execute("SELECT analysis FROM uploads WHERE id = ?", (report_id,))
+    row = cursor.fetchone()
+    return results_from_json(row[0]) if row and row[0] else None
+
+
+# -------------------------
+# Near-duplicate index (cached)
+# -------------------------
+@st.cache_resource
+def get_fingerprint_index():
+    """Multi-index hash over fingerprints of already analyzed videos, keyed by report id"""
+    index = MultiIndexHash()
+    rows = conn.execute(
+        "SELECT id, fingerprint FROM uploads WHERE fingerprint IS NOT NULL AND analysis IS NOT NULL"
+    ).fetchall()
+    for report_id, fingerprint in rows:
+        index.add(from_hex(fingerprint), report_id)
+    return index
+
+
+def find_duplicate(report_id, fingerprint):
+    """Closest other analyzed report whose video is a near-duplicate, or None"""
+    if not fingerprint:
+        return None
+    for _, match_id in get_fingerprint_index().search(from_hex(fingerprint)):
+        if match_id != report_id:
+            return match_id
+    return None
+
+
+def store_analysis(report_id, fingerprint, results):
+    """Persist analysis results and make the video available for duplicate lookup"""
+    save_analysis(report_id, results)
+    if fingerprint:
+        get_fingerprint_index().add(from_hex(fingerprint), report_id)
+
+
 def update_status(report_id, status):
     cursor.execute("UPDATE uploads SET status = ? WHERE id = ?", (status, report_id))
     conn.commit()
@@ -124,11 +188,11 @@ def generate_report(report_id, video_analysis_results, text_analysis_results_en,
 # -------------------------
 # Session state initialization helper
 # -------------------------
-def init_session_state(report_id):
+def init_session_state(report_id, stored_analysis=None):
     video_key = f"video_analysis_{report_id}"
     text_key = f"text_analysis_en_{report_id}"  # store Gemini output in English in state
-    if video_key not in st.session_state:
-        st.session_state[video_key] = None
+    if video_key not in st.session_state or st.session_state[video_key] is None:
+        st.session_state[video_key] = results_from_json(stored_analysis) if stored_analysis else None
     if text_key not in st.session_state:
         st.session_state[text_key] = None
 
@@ -160,14 +224,32 @@ if not reports:
 else:
     # Iterate reports
     for report in reports:
-        report_id, user_id, video_path, text_report_en, current_status_en = report
-        init_session_state(report_id)
+        report_id, user_id, video_path, text_report_en, current_status_en, fingerprint, stored_analysis = report
+        init_session_state(report_id, stored_analysis)
+        duplicate_of = find_duplicate(report_id, fingerprint)
+        reused_analysis = False
+
+        # Re-uploads of an analyzed video reuse its results instead of re-running the pipeline
+        if duplicate_of is not None and not stored_analysis:
+            reused = load_analysis(duplicate_of)
+            if reused:
+                store_analysis(report_id, fingerprint, reused)
+                st.session_state[f"video_analysis_{report_id}"] = reused
+                reused_analysis = True
 
         # Container per report
         with st.container():
             st.markdown("### " + translate(f"Report ID: {report_id}", TARGET_LANG))
             st.write(translate(f"User ID: {user_id}", TARGET_LANG))
 
+            if reused_analysis:
+                st.warning(translate(
+                    f"Near-duplicate of report {duplicate_of}: video analysis reused from that report.",
+                    TARGET_LANG
+                ))
+            elif duplicate_of is not None:
+                st.warning(translate(f"Near-duplicate of report {duplicate_of}.", TARGET_LANG))
+
             # Video display
             if video_path and os.path.exists(video_path):
                 st.video(video_path)
@@ -197,6 +279,7 @@ else:
                     with st.spinner(translate("Analyzing video...", TARGET_LANG)):
                         try:
                             result = analyze_video(video_path)
+                            store_analysis(report_id, fingerprint, result)
                             st.session_state[f"video_analysis_{report_id}"] = result
                             st.success(translate("Video analysis complete!", TARGET_LANG))
                         except Exception as e:
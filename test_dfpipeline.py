@@ -0,0 +1,56 @@
+# test_dfpipeline.py
+import json
+
+import numpy as np
+import pytest
+from moviepy.editor import AudioClip, VideoClip
+
+from dfpipeline import SimpleDeepfakeDetector, results_to_json
+
+FPS = 10
+SIZE = (64, 48)
+
+
+def write_clip(path, duration, make_frame, make_sound):
+    clip = VideoClip(make_frame, duration=duration)
+    clip = clip.set_audio(AudioClip(make_sound, duration=duration, fps=8000))
+    clip.write_videofile(str(path), fps=FPS, codec="libx264", audio_codec="aac", logger=None)
+    return str(path)
+
+
+@pytest.fixture(scope="module")
+def moving_clip(tmp_path_factory):
+    rng = np.random.default_rng(0)
+    frames = rng.integers(0, 256, size=(40, SIZE[1], SIZE[0], 3), dtype=np.uint8)
+    return write_clip(
+        tmp_path_factory.mktemp("clips") / "moving.mp4", 4.0,
+        lambda t: frames[min(int(t * FPS), len(frames) - 1)],
+        lambda t: np.sin(2 * np.pi * 440 * t) * (1 + np.sin(2 * np.pi * t)),
+    )
+
+
+@pytest.fixture(scope="module")
+def static_clip(tmp_path_factory):
+    frame = np.full((SIZE[1], SIZE[0], 3), 128, dtype=np.uint8)
+    return write_clip(
+        tmp_path_factory.mktemp("clips") / "static.mp4", 3.0,
+        lambda t: frame,
+        lambda t: np.sin(2 * np.pi * 440 * t),
+    )
+
+
+def test_worker_count_does_not_change_results(moving_clip):
+    detector = SimpleDeepfakeDetector()
+    inline = detector.process_video(moving_clip, workers=1, segment_seconds=1.0)
+    pooled = detector.process_video(moving_clip, workers=2, segment_seconds=1.0)
+
+    assert len(inline['timeline']['start']) == 4
+    assert results_to_json(inline) == results_to_json(pooled)
+
+
+def test_static_clip_scores_are_finite(static_clip):
+    results = SimpleDeepfakeDetector().process_video(static_clip, workers=1, segment_seconds=1.0)
+
+    assert results['component_scores']['audio_visual'] == 0.5
+    assert np.all(results['timeline']['audio_visual'] == 0.5)
+    json.dumps(json.loads(results_to_json(results)), allow_nan=False)
@@ -0,0 +1,65 @@
+# test_video_fingerprint.py
+import random
+
+import pytest
+
+from video_fingerprint import FINGERPRINT_BITS, MAX_DISTANCE, MultiIndexHash, hamming
+
+
+def flip_bits(fingerprint, n, rng):
+    for bit in rng.sample(range(FINGERPRINT_BITS), n):
+        fingerprint ^= 1 << bit
+    return fingerprint
+
+
+def build_index(n, rng):
+    index = MultiIndexHash()
+    fingerprints = [rng.getrandbits(FINGERPRINT_BITS) for _ in range(n)]
+    for key, fingerprint in enumerate(fingerprints):
+        index.add(fingerprint, key)
+    return index, fingerprints
+
+
+# 70000 entries switch the index to chunks probed within radius 1
+@pytest.mark.parametrize("size", [2000, 70000])
+def test_search_finds_every_match_within_max_distance(size):
+    rng = random.Random(0)
+    index, fingerprints = build_index(size, rng)
+
+    for key in rng.sample(range(len(fingerprints)), 20):
+        query = flip_bits(fingerprints[key], rng.randint(0, MAX_DISTANCE), rng)
+        expected = sorted(
+            (hamming(query, fp), k) for k, fp in enumerate(fingerprints)
+            if hamming(query, fp) <= MAX_DISTANCE
+        )
+        assert index.search(query) == expected
+        assert (hamming(query, fingerprints[key]), key) in expected
+
+
+def test_lookup_work_grows_sublinearly():
+    sizes = [1000, 4000, 16000, 64000]
+    work = []
+    for n in sizes:
+        rng = random.Random(n)
+        index, fingerprints = build_index(n, rng)
+        visited = [
+            len(index.candidates(flip_bits(fingerprints[key], MAX_DISTANCE, rng)))
+            for key in rng.sample(range(n), 100)
+        ]
+        work.append(index.probes_per_lookup() + sum(visited) / len(visited))
+
+    # Each 4x growth in stored fingerprints costs less than 4x the lookup work
+    for (small, large), (small_work, large_work) in zip(zip(sizes, sizes[1:]), zip(work, work[1:])):
+        assert large_work / small_work < large / small
+    # ... and over the whole range it grows slower than sqrt(N)
+    assert work[-1] / work[0] < (sizes[-1] / sizes[0]) ** 0.5
+
+
+def test_adding_same_key_again_is_ignored():
+    index = MultiIndexHash()
+    index.add(0b1011, 7)
+    index.add(0b1011, 7)
+    index.add(0b0000, 7)
+
+    assert len(index) == 1
+    assert index.search(0b1011) == [(0, 7)]
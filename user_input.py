@@ -3,6 +3,8 @@ import streamlit as st
 import sqlite3
 from pathlib import Path
 from lingo_translation import translate, LANGUAGES
+from db_schema import DB_PATH, init_db
+from video_fingerprint import compute_fingerprint, to_hex
 
 # -------------------------
 # Ensure upload folder exists
@@ -51,30 +53,6 @@ st.markdown("""
 # -------------------------
 # DATABASE SETUP
 # -------------------------
-conn = sqlite3.connect('user_data.db')
-cursor = conn.cursor()
-
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS users (
-    user_id INTEGER PRIMARY KEY,
-    username TEXT UNIQUE,
-    password TEXT
-)
-''')
-
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS uploads (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    user_id INTEGER,
-    video_path TEXT,
-    text_report TEXT,
-    status TEXT DEFAULT 'Pending',
-    FOREIGN KEY(user_id) REFERENCES users(user_id)
-)
-''')
-
-conn.commit()
-
 # -------------------------
 # Dummy Users (For Testing)
 # -------------------------
@@ -85,12 +63,26 @@ dummy_users = [
     {'username': 'reporter4', 'password': 'password4'}
 ]
 
-for user in dummy_users:
-    cursor.execute(
-        'INSERT OR IGNORE INTO users (username, password) VALUES (?, ?)',
-        (user['username'], user['password'])
-    )
-conn.commit()
+
+@st.cache_resource
+def setup_database():
+    """Migrate the schema and seed the dummy users once per process, not on every rerun"""
+    setup_conn = sqlite3.connect(DB_PATH)
+    try:
+        init_db(setup_conn)
+        setup_conn.executemany(
+            'INSERT OR IGNORE INTO users (username, password) VALUES (?, ?)',
+            [(user['username'], user['password']) for user in dummy_users]
+        )
+        setup_conn.commit()
+    finally:
+        setup_conn.close()
+
+
+setup_database()
+
+conn = sqlite3.connect(DB_PATH)
+cursor = conn.cursor()
 
 
 # -------------------------
@@ -105,21 +97,41 @@ def authenticate(username, password):
 
 
 def save_upload(user_id, video_path, text_report):
+    # Perceptual fingerprint lets the authority dashboard spot re-uploads
+    fingerprint = to_hex(compute_fingerprint(video_path))
     cursor.execute(
-        'INSERT INTO uploads (user_id, video_path, text_report) VALUES (?, ?, ?)',
-        (user_id, video_path, text_report)
+        'INSERT INTO uploads (user_id, video_path, text_report, fingerprint) VALUES (?, ?, ?, ?)',
+        (user_id, video_path, text_report, fingerprint)
     )
     conn.commit()
 
 
-def get_user_reports(user_id):
+def get_user_report_changes(user_id, since_version):
     cursor.execute(
-        'SELECT video_path, text_report, status FROM uploads WHERE user_id = ?',
-        (user_id,)
+        'SELECT id, video_path, text_report, status, version FROM uploads '
+        'WHERE user_id = ? AND version > ? ORDER BY version',
+        (user_id, since_version)
     )
     return cursor.fetchall()
 
 
+def get_user_reports(user_id):
+    """Session-cached reports; each rerun only fetches rows changed since the last one"""
+    if st.session_state.get("reports_owner") != user_id:
+        st.session_state.reports_owner = user_id
+        st.session_state.reports_cache = {}
+        st.session_state.reports_version = 0
+
+    for report_id, video_path, text_report, status, version in get_user_report_changes(
+        user_id, st.session_state.reports_version
+    ):
+        st.session_state.reports_cache[report_id] = (video_path, text_report, status)
+        st.session_state.reports_version = version
+
+    cache = st.session_state.reports_cache
+    return [cache[report_id] for report_id in sorted(cache)]
+
+
 # -------------------------
 # Title
 # -------------------------
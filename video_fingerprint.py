@@ -0,0 +1,161 @@
+# video_fingerprint.py
+import math
+import threading
+from itertools import combinations
+
+import cv2
+
+# Frames sampled per video; each contributes a 64-bit dHash
+SAMPLE_FRAMES = 4
+HASH_SIZE = 8
+FINGERPRINT_BITS = SAMPLE_FRAMES * HASH_SIZE * HASH_SIZE
+# Max Hamming distance (out of SAMPLE_FRAMES * 64 bits) for a near-duplicate
+MAX_DISTANCE = 24
+
+
+def compute_fingerprint(video_path, n_frames=SAMPLE_FRAMES):
+    """
+    Perceptual fingerprint of a video: dHash of `n_frames` frames sampled
+    at fixed fractions of its length, concatenated into one int.
+    Robust to re-encoding and resolution changes. Returns None if the
+    video cannot be read.
+    """
+    capture = cv2.VideoCapture(str(video_path))
+    try:
+        total = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        if total <= 0:
+            return None
+
+        fingerprint = 0
+        for i in range(n_frames):
+            capture.set(cv2.CAP_PROP_POS_FRAMES, int(total * (i + 1) / (n_frames + 1)))
+            ok, frame = capture.read()
+            if not ok:
+                return None
+            fingerprint = (fingerprint << HASH_SIZE * HASH_SIZE) | _dhash(frame)
+
+        return fingerprint
+    finally:
+        capture.release()
+
+
+def _dhash(frame):
+    """64-bit difference hash of one BGR frame"""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (HASH_SIZE + 1, HASH_SIZE), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value
+
+
+def hamming(a, b):
+    return (a ^ b).bit_count()
+
+
+def to_hex(fingerprint):
+    return None if fingerprint is None else format(fingerprint, "x")
+
+
+def from_hex(text):
+    return None if not text else int(text, 16)
+
+
+class MultiIndexHash:
+    """
+    Multi-index hash over fingerprints under Hamming distance.
+    The bits are split into m chunks, each with its own table. A
+    fingerprint within `max_distance` r of the query differs from it by at
+    most r // m bits on some chunk (pigeonhole), so lookups probe every
+    chunk value within r // m of the query's and only compare the
+    fingerprints found there. m is chosen for the current size N to
+    minimize probes + expected random candidates, which gives chunks of
+    about log2(N) bits and lookups that grow sublinearly in N. Tables are
+    rebuilt for the new size each time the index doubles.
+    Safe to share between Streamlit sessions; re-adding a key is a no-op.
+    """
+
+    def __init__(self, max_distance=MAX_DISTANCE, bits=FINGERPRINT_BITS):
+        self.max_distance = max_distance
+        self.bits = bits
+        self.fingerprints = {}
+        self.lock = threading.Lock()
+        self._rebuild()
+
+    def _rebuild(self):
+        """Re-chunk for the current size; caller holds the lock (or is __init__)"""
+        size = max(len(self.fingerprints), 2)
+        n_chunks = min(range(1, self.bits + 1), key=lambda m: self._lookup_cost(m, size))
+        # (shift, width) per chunk, widths as even as possible
+        self.chunks = []
+        for i in range(n_chunks):
+            low, high = i * self.bits // n_chunks, (i + 1) * self.bits // n_chunks
+            self.chunks.append((low, high - low))
+        self.radius = self.max_distance // n_chunks
+        self.tables = [{} for _ in self.chunks]
+        self.rebuild_at = 2 * size
+
+        for key, fingerprint in self.fingerprints.items():
+            self._insert(fingerprint, key)
+
+    def _lookup_cost(self, n_chunks, size):
+        """Probes plus expected random candidates per lookup with `n_chunks` chunks"""
+        width = self.bits // n_chunks
+        probes = n_chunks * sum(math.comb(width, k) for k in range(self.max_distance // n_chunks + 1))
+        return probes + probes * size / 2 ** width
+
+    def _insert(self, fingerprint, key):
+        for table, (shift, width) in zip(self.tables, self.chunks):
+            value = (fingerprint >> shift) & ((1 << width) - 1)
+            table.setdefault(value, []).append(key)
+
+    def _probes(self, value, width):
+        """All chunk values within self.radius bits of `value`"""
+        for k in range(self.radius + 1):
+            for positions in combinations(range(width), k):
+                probe = value
+                for bit in positions:
+                    probe ^= 1 << bit
+                yield probe
+
+    def probes_per_lookup(self):
+        """Table lookups one search makes with the current chunking"""
+        with self.lock:
+            return sum(
+                math.comb(width, k)
+                for _, width in self.chunks
+                for k in range(self.radius + 1)
+            )
+
+    def add(self, fingerprint, key):
+        with self.lock:
+            if key in self.fingerprints:
+                return
+            self.fingerprints[key] = fingerprint
+            if len(self.fingerprints) >= self.rebuild_at:
+                self._rebuild()
+            else:
+                self._insert(fingerprint, key)
+
+    def candidates(self, fingerprint):
+        """Keys found by probing each chunk table near `fingerprint`"""
+        with self.lock:
+            keys = set()
+            for table, (shift, width) in zip(self.tables, self.chunks):
+                value = (fingerprint >> shift) & ((1 << width) - 1)
+                for probe in self._probes(value, width):
+                    keys.update(table.get(probe, ()))
+            return {key: self.fingerprints[key] for key in keys}
+
+    def search(self, fingerprint):
+        """All (distance, key) pairs within `max_distance`, closest first"""
+        matches = [
+            (hamming(fingerprint, candidate), key)
+            for key, candidate in self.candidates(fingerprint).items()
+        ]
+        return sorted(m for m in matches if m[0] <= self.max_distance)
+
+    def __len__(self):
+        return len(self.fingerprints)